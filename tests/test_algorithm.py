@@ -0,0 +1,131 @@
+"""Test for constraints generation."""
+
+import pytest
+from z3 import Or, sat
+
+from z3_armor import Z3Armor, algorithm
+from z3_armor.algorithm import NoMoreConstraintError
+
+
+@pytest.mark.parametrize("secret", [b"ab", b"secret", b"z3-armor!"])
+def test_fit_unique_solution(secret: bytes) -> None:
+    """Test if fitted constraints only accept the secret."""
+    armored = Z3Armor(secret, random_state=0)
+    armored.fit()
+    assert armored.verify(secret)
+    assert list(armored.solutions()) == [secret]
+
+    # Cross-check with a solver built from scratch
+    solver, terms = armored.solver()
+    assert solver.check() == sat
+    solver.add(Or([t != v for t, v in zip(terms, secret)]))
+    assert solver.check() != sat
+
+
+def test_reduce_keep_complete() -> None:
+    """Test if reduction keeps a unique solution."""
+    armored = Z3Armor(b"secret", random_state=1)
+    while not armored.complete():
+        armored.generate()
+    armored.reduce()
+    assert armored.complete()
+
+    # Dropping any remaining constraint must break uniqueness
+    size = len(armored.constraints)
+    for i in range(size):
+        kept = bytearray([1]) * size
+        kept[i] = 0
+        assert not armored.complete_mask(kept)
+
+
+def test_generate_exhausted() -> None:
+    """Test if generation stops when all constraints are used."""
+    armored = Z3Armor(b"aa", random_state=0)
+
+    def _generate_all() -> None:
+        while True:
+            armored.generate()
+
+    with pytest.raises(NoMoreConstraintError):
+        _generate_all()
+    keys = [const.key for const in armored.constraints]
+    assert len(keys) == len(set(keys))
+
+
+def test_verify_match_check() -> None:
+    """Test if verify agrees with the check of each constraint."""
+    armored = Z3Armor(b"secret", random_state=2)
+    armored.fit()
+    candidates = [b"secret", b"secreT", b"SECRET", b"terces"]
+    for candidate in candidates:
+        expected = all(c.check(candidate) for c in armored.constraints)
+        assert armored.verify(candidate) is expected
+    assert not armored.verify(b"secreT")
+
+
+def test_verify_many() -> None:
+    """Test if bulk verification matches verify."""
+    armored = Z3Armor(b"secret", random_state=3)
+    armored.fit()
+    candidates = [b"secret", b"secreT", b"SECRET", b"secret"]
+    assert armored.verify_many(candidates) == [True, False, False, True]
+    assert armored.verify_many(iter(candidates)) == [
+        armored.verify(candidate) for candidate in candidates
+    ]
+
+
+def test_generate_during_solutions() -> None:
+    """Test if constraints generated during an enumeration are kept."""
+    armored = Z3Armor(b"secret", random_state=4)
+    solutions = armored.solutions()
+    next(solutions)
+    while not armored.complete():
+        armored.generate()
+    solutions.close()
+    assert armored.complete()
+    assert list(armored.solutions()) == [b"secret"]
+
+
+def test_constraints_read_only() -> None:
+    """Test if constraints cannot get out of sync with the solver."""
+    armored = Z3Armor(b"secret", random_state=5)
+    armored.fit()
+    constraints = armored.constraints
+    extended = constraints + constraints[:1]
+    assert len(extended) == len(constraints) + 1
+    assert armored.constraints == constraints
+    assert armored.complete()
+    with pytest.raises(AttributeError):
+        armored.constraints = extended  # type: ignore[misc]
+    with pytest.raises(ValueError, match="Mask size"):
+        armored.complete_mask(bytearray([1]) * (len(armored.constraints) - 1))
+
+
+def test_solver_reuse_expressions() -> None:
+    """Test if solver reuses the expressions built during generation."""
+    armored = Z3Armor(b"secret", random_state=6)
+    armored.fit()
+    cached = [const._cached_ast for const in armored.constraints]  # noqa: SLF001
+    armored.solver()
+    for const, ast in zip(armored.constraints, cached):
+        assert const._cached_ast is ast  # noqa: SLF001
+
+
+def test_fit_with_tactics(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test if solvers built from tactics still find the secret."""
+    monkeypatch.setattr(
+        algorithm, "SOLVER_TACTICS", ("simplify", "bit-blast", "sat")
+    )
+    armored = Z3Armor(b"secret", random_state=7)
+    armored.fit()
+    assert list(armored.solutions()) == [b"secret"]
+
+
+def test_solutions_keep_solver_size() -> None:
+    """Test if enumerations do not grow the incremental solver."""
+    armored = Z3Armor(b"secret", random_state=8)
+    armored.fit()
+    size = len(armored._solver.assertions())  # noqa: SLF001
+    for _ in range(20):
+        assert list(armored.solutions()) == [b"secret"]
+    assert len(armored._solver.assertions()) == size  # noqa: SLF001
@@ -48,6 +48,25 @@ def test_cli_version() -> None:
     assert "version" in stdout.getvalue()
 
 
+def test_version_without_z3() -> None:
+    """Test if showing the version does not load z3 nor jinja."""
+    code = (
+        "import sys\n"
+        "from z3_armor import entrypoint\n"
+        "try:\n"
+        "    entrypoint(('--version',))\n"
+        "except SystemExit:\n"
+        "    pass\n"
+        "print('z3' in sys.modules, 'jinja2' in sys.modules)\n"
+    )
+    out = subprocess.check_output(
+        (sys.executable, "-c", code),
+        text=True,
+        shell=False,
+    )
+    assert out.splitlines()[-1] == "False False"
+
+
 def test_import() -> None:
     """Test if module entrypoint has correct imports."""
     import z3_armor.__main__  # NoQA: F401
@@ -71,6 +90,18 @@ def test_secret_from_stdin() -> None:
     assert stdout.getvalue() == ""
 
 
+def test_secret_from_empty_stdin() -> None:
+    """Test if an empty stdin is reported as an error."""
+    stdin = sys.stdin
+    try:
+        sys.stdin = io.StringIO("")
+        with pytest.raises(SystemExit) as exc_info:
+            entrypoint(("--template", "crackme.c"))
+    finally:
+        sys.stdin = stdin
+    assert exc_info.value.code == 1
+
+
 def test_secret_from_cmd() -> None:
     """Test command hello."""
     stdout = io.StringIO()
@@ -1,8 +1,8 @@
 """Main module."""
 
-from .algorithm import Z3Armor
+from typing import TYPE_CHECKING, Any
+
 from .cli import entrypoint
-from .constraint import Constraint
 from .info import (
     __author__,
     __email__,
@@ -12,6 +12,10 @@ from .info import (
     __version__,
 )
 
+if TYPE_CHECKING:
+    from .algorithm import Z3Armor  # noqa: TCH004
+    from .constraint import Constraint  # noqa: TCH004
+
 __all__ = [
     "entrypoint",
     "__author__",
@@ -23,3 +27,17 @@ __all__ = [
     "Constraint",
     "Z3Armor",
 ]
+
+
+def __getattr__(name: str) -> Any:
+    """Import z3 and jinja only on first access to the classes using them."""
+    if name == "Z3Armor":
+        from .algorithm import Z3Armor
+
+        return Z3Armor
+    if name == "Constraint":
+        from .constraint import Constraint
+
+        return Constraint
+    error_message = f"module {__name__!r} has no attribute {name!r}"
+    raise AttributeError(error_message)
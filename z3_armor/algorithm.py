@@ -1,13 +1,36 @@
 """Generator for constraints."""
 
 import builtins
+import functools
 import logging
 import pathlib
 import random
-from typing import Iterator, List, Optional, Tuple, Union
+from typing import (
+    TYPE_CHECKING,
+    Callable,
+    Generator,
+    Hashable,
+    Iterable,
+    List,
+    Optional,
+    Set,
+    Tuple,
+    Union,
+)
 
-from jinja2 import Environment, FileSystemLoader, Template
-from z3 import BitVec, Solver, sat
+from z3 import (
+    And,
+    BitVec,
+    BoolRef,
+    FreshBool,
+    Implies,
+    Or,
+    Solver,
+    Tactic,
+    Then,
+    sat,
+    unsat,
+)
 
 from .constraint import (
     CompareConstraint,
@@ -16,6 +39,9 @@ from .constraint import (
 )
 from .operator import OPERATORS, REVERSIBLE_OPERATORS
 
+if TYPE_CHECKING:
+    from jinja2 import Environment, Template
+
 # Load jinja Environnement
 HERE = pathlib.Path(__file__).parent.resolve()
 TEMPLATES = HERE / "templates"
@@ -23,6 +49,45 @@ TEMPLATES = HERE / "templates"
 # Logging
 logger = logging.getLogger(__name__)
 
+# Number of tries for generate a new constraint
+MAX_ATTEMPTS = 1000
+
+# Tactics used to build solvers, the default solver is used when empty,
+# e.g. ("simplify", "bit-blast", "sat") for a bit-blasting pipeline
+SOLVER_TACTICS: Tuple[str, ...] = ()
+
+# Operators available for constraints
+_OPERATORS_TUPLE = tuple(OPERATORS.values())
+_REV_OPERATORS_TUPLE = tuple(REVERSIBLE_OPERATORS.values())
+
+# Builtins exposed to templates
+_BUILTIN_GLOBALS = {
+    name: getattr(builtins, name)
+    for name in dir(builtins)
+    if not name.startswith("_")
+}
+
+
+@functools.lru_cache(maxsize=32)
+def _env_for_dir(directory: pathlib.Path) -> "Environment":
+    """Get the jinja Environment loading templates from a directory."""
+    from jinja2 import Environment, FileSystemLoader
+
+    env = Environment(
+        loader=FileSystemLoader(directory),
+        autoescape=False,  # noqa: S701
+    )
+    env.globals.update(_BUILTIN_GLOBALS)
+    return env
+
+
+def _make_solver() -> Solver:
+    """Create a solver from SOLVER_TACTICS."""
+    if not SOLVER_TACTICS:
+        return Solver()
+    tactics = [Tactic(name) for name in SOLVER_TACTICS]
+    return functools.reduce(Then, tactics).solver()
+
 
 class NoMoreConstraintError(RecursionError):
     """No constraints can be generated."""
@@ -35,153 +100,189 @@ class Z3Armor:
         random_state: Optional[int] = None,
     ) -> None:
         """Instantiated Z3Armor."""
-        self.indexes = {i: 0 for i in range(len(secret))}
-        self.constraints: List[Constraint] = []
-        if random_state is not None:
-            self.rand = random.Random(random_state)  # noqa: S311
-        else:
-            self.rand = random.SystemRandom()
+        self._counts = [0] * len(secret)
+        self._constraints: List[Constraint] = []
+        self._constraint_keys: Set[Hashable] = set()
+        self._fast_verify: Optional[Callable[[bytes], bool]] = None
+        # Seeded from os.urandom when no random_state is given
+        self.rand = random.Random(random_state)  # noqa: S311
         self.secret = secret
+        self._secret_ints: Tuple[int, ...] = tuple(secret)
+        # Incremental solver, each constraint is enabled by an indicator
+        self._terms = [BitVec(f"p[{i}]", 8) for i in range(len(secret))]
+        self._solver = _make_solver()
+        self._indicators: List[BoolRef] = []
+        # Literals assuming the terms are, or are not, the secret
+        self._is_secret = FreshBool("is_secret")
+        self._not_secret = FreshBool("not_secret")
+        self._solver.add(
+            Implies(
+                self._is_secret,
+                And([t == v for t, v in zip(self._terms, secret)]),
+            ),
+            Implies(
+                self._not_secret,
+                Or([t != v for t, v in zip(self._terms, secret)]),
+            ),
+        )
+        # Whether the secret is known to satisfy all constraints
+        self._is_sat_known = False
 
     def __str__(self) -> str:
         """Represent the ConstraintGenerator."""
         return (
-            f"<ConstraintGenerator constraints={len(self.constraints)} "
+            f"<ConstraintGenerator constraints={len(self._constraints)} "
             f"secret={self.secret!r}>"
         )
 
+    @property
+    def constraints(self) -> Tuple[Constraint, ...]:
+        """Constraints of the generator, in generation order."""
+        return tuple(self._constraints)
+
     def solver(self) -> Tuple[Solver, List[BitVec]]:
         """Create the solver."""
-        solver = Solver()
-        terms = [BitVec(f"p[{i}]", 8) for i in range(len(self.secret))]
-        for const in self.constraints:
-            solver.add(const.apply(terms))
-        return solver, terms
+        solver = _make_solver()
+        # Reuse the instance terms so the expressions cached by apply hit
+        for const in self._constraints:
+            solver.add(const.apply(self._terms))
+        return solver, list(self._terms)
 
     def verify(self, secret: bytes) -> bool:
         """Verify a password on the constraint generator."""
-        return all(const.check(secret) for const in self.constraints)
-
-    def complete(self) -> bool:
-        """Check that the solver has a valid unique solution."""
-        # Get the current solver
-        solver, terms = self.solver()
+        return self._get_verify()(secret)
+
+    def verify_many(self, secrets: Iterable[bytes]) -> List[bool]:
+        """Verify many passwords on the constraint generator."""
+        return list(map(self._get_verify(), secrets))
+
+    def _get_verify(self) -> Callable[[bytes], bool]:
+        """Get the verification function, compiled on first use."""
+        if self._fast_verify is None:
+            self._fast_verify = self._compile_verify()
+        return self._fast_verify
+
+    def _compile_verify(self) -> Callable[[bytes], bool]:
+        """Build a verification function for the current constraints."""
+        compares = []
+        operations = []
+        others = []
+        for const in self._constraints:
+            if isinstance(const, CompareConstraint):
+                compares.append((const.x, const.y, const.op.func, const.n))
+            elif isinstance(const, OperationConstraint):
+                operations.append((const.x, const.y, const.op.func, const.n))
+            else:
+                others.append(const.check)
 
-        # Check if model is sat
-        result = solver.check()
-        if result != sat:
-            logger.debug("No complete because model solver is %s", result)
-            return False
+        def _verify(secret: bytes) -> bool:
+            for x, y, func, n in compares:
+                if secret[x] != func(secret[y], n) & 0xFF:
+                    return False
+            for x, y, func, n in operations:
+                if func(secret[x], secret[y]) & 0xFF != n:
+                    return False
+            return all(check(secret) for check in others)
 
-        # Check if one of secret characters is None
-        model = solver.model()
-        solution = [model[c] for c in terms]
-        if any(c is None for c in solution):
-            logger.debug("No complete because some char are missing")
-            return False
+        return _verify
 
-        # Check if first guess is the secret
-        guess: Optional[bytes] = bytes(c.as_long() for c in solution)
-        if guess != self.secret:
-            logger.debug("No complete because first guess is wrong")
-            return False
+    def complete(self) -> bool:
+        """Check that the solver has a valid unique solution."""
+        return self.complete_mask(bytearray([1]) * len(self._constraints))
+
+    def complete_mask(self, kept: bytearray) -> bool:
+        """Check for a unique solution with only the kept constraints."""
+        if len(kept) != len(self._indicators):
+            error_message = "Mask size does not match the constraints."
+            raise ValueError(error_message)
+        solver = self._solver
+        indicators = [c for c, k in zip(self._indicators, kept) if k]
+
+        # Check if the secret is a solution, which holds for any subset of
+        # constraints once it holds for all of them
+        if not self._is_sat_known:
+            result = solver.check(*indicators, self._is_secret)
+            if result != sat:
+                logger.debug("No complete because secret is %s", result)
+                return False
+            self._is_sat_known = all(kept)
 
         # Check if there are only one guess
-        guess = None
-        for secret in self.solutions():
-            if guess:
-                logger.debug("No complete because other guess exist")
-                return False
-            guess = secret
-        if guess is None:
-            raise TypeError
+        result = solver.check(*indicators, self._not_secret)
+        if result != unsat:
+            logger.debug("No complete because other guess is %s", result)
+            return False
 
         # All is ok so return True
         logger.debug("Complete")
         return True
 
-    def solutions(self) -> Iterator[bytes]:
+    def solutions(self) -> Generator[bytes, None, None]:
         """Find all solution for the currents constraints."""
         # ref: https://stackoverflow.com/questions/11867611/z3py-checking-all-solutions-for-equation
         # ref: https://theory.stanford.edu/%7Enikolaj/programmingz3.html#sec-blocking-evaluations
+        # Blocking clauses go to a dedicated solver, the shared one is left
+        # untouched even while the enumeration is suspended
         solver, terms = self.solver()
-        previous = set()
-
-        def _all_smt_rec(terms: List[BitVec]) -> Iterator[bytes]:
-            if sat == solver.check():
-                model = solver.model()
-                solution = [model[c] for c in terms]
-                if all(c is not None for c in solution):
-                    password = bytes(c.as_long() for c in solution)
-                    if password not in previous:
-                        previous.add(password)
-                        yield password
-                for i in range(len(terms)):
-                    solver.push()
-                    try:
-                        solver.add(terms[i] != model.eval(terms[i]))
-                        for j in range(i):
-                            solver.add(terms[j] == model.eval(terms[j]))
-                        yield from _all_smt_rec(terms[i:])
-                    finally:
-                        solver.pop()
-
-        yield from _all_smt_rec(terms)
+        while solver.check() == sat:
+            model = solver.model()
+            values = [
+                model.eval(t, model_completion=True).as_long() for t in terms
+            ]
+            yield bytes(values)
+            # Block the current solution
+            solver.add(Or([t != v for t, v in zip(terms, values)]))
 
     def weights(self) -> List[float]:
         """Computes the weights of each index."""
-        total = sum(count for count in self.indexes.values())
+        total = sum(self._counts)
         if total == 0:
-            return [1 / len(self.indexes)] * len(self.indexes)
-        return [count / total for count in self.indexes.values()]
+            return [1 / len(self._counts)] * len(self._counts)
+        return [count / total for count in self._counts]
 
     def generate(self, rand: Optional[random.Random] = None) -> Constraint:
         """Generate a new constraint and it into the generator."""
-        # Generate an temporary generator
         if rand is None:
-            seed = self.rand.random()
-            rand = random.Random(seed)  # noqa: S311
+            rand = self.rand
 
-        used_indexes = []
+        secret = self._secret_ints
         const: Constraint
-
-        # Create first constraints
-        if rand.randint(0, 1) == 0:
-            x, y = self.weighted_sampling(rand, 2)
-            used_indexes.append(x)
-            used_indexes.append(y)
-            rev_op = rand.choice(list(REVERSIBLE_OPERATORS.values()))
-            n = rev_op.reverse(self.secret[y], self.secret[x]) % 256
-            # Avoid linkage of the same letter
-            if n == 0:
-                try:
-                    return self.generate(rand=rand)
-                except RecursionError:
-                    error_message = "No more constraint can be generated."
-                    raise NoMoreConstraintError(error_message) from None
-            const = CompareConstraint(x, y, rev_op, n)
-
-        # Create a OperationConstraint
+        for _attempt in range(MAX_ATTEMPTS):
+            # Create first constraints
+            if rand.randint(0, 1) == 0:
+                x, y = self.weighted_sampling(rand, 2)
+                rev_op = rand.choice(_REV_OPERATORS_TUPLE)
+                n = rev_op.reverse(secret[y], secret[x]) % 256
+                # Avoid linkage of the same letter
+                if n == 0:
+                    continue
+                const = CompareConstraint(x, y, rev_op, n)
+
+            # Create a OperationConstraint
+            else:
+                x, y = self.weighted_sampling(rand, 2)
+                op = rand.choice(_OPERATORS_TUPLE)
+                n = op.func(secret[x], secret[y]) % 256
+                const = OperationConstraint(x, y, op, n)
+
+            # Regenerate already existing constants
+            key = const.key
+            if key not in self._constraint_keys:
+                break
         else:
-            x, y = self.weighted_sampling(rand, 2)
-            used_indexes.append(x)
-            used_indexes.append(y)
-            op = rand.choice(list(OPERATORS.values()))
-            n = op(self.secret[x], self.secret[y]) % 256
-            const = OperationConstraint(x, y, op, n)
-
-        # Regenerate already existing constants
-        if const in self.constraints:
-            try:
-                return self.generate(rand=rand)
-            except RecursionError:
-                error_message = "No more constraint can be generated."
-                raise NoMoreConstraintError(error_message) from None
+            error_message = "No more constraint can be generated."
+            raise NoMoreConstraintError(error_message)
 
         # Use index
-        for i in used_indexes:
-            self.indexes[i] += 1
-        self.constraints.append(const)
+        self._counts[x] += 1
+        self._counts[y] += 1
+        self._constraints.append(const)
+        self._fast_verify = None
+        self._is_sat_known = False
+        self._constraint_keys.add(key)
+        indicator = FreshBool("c")
+        self._indicators.append(indicator)
+        self._solver.add(Implies(indicator, const.apply(self._terms)))
         logger.info("Generate new constraint %s", const)
         return const
 
@@ -204,70 +305,60 @@ class Z3Armor:
         k: int,
     ) -> List[int]:
         """Get index using sampling."""
-        if k > len(self.indexes):
+        counts = self._counts
+        if k > len(counts):
             error_message = "Not enough indexes."
             raise IndexError(error_message)
-        indexes = self.indexes.copy()
+        remaining = list(range(len(counts)))
         chosen = []
         for _ in range(k):
-            max_count = max(indexes.values())
-            if min(indexes.values()) == max_count:
+            values = [counts[i] for i in remaining]
+            max_count = max(values)
+            if min(values) == max_count:
                 max_count += 1
-            weights = [max_count - v for v in indexes.values()]
-            (choose,) = rand.choices(
-                list(indexes.keys()), k=1, weights=weights
+            (position,) = rand.choices(
+                range(len(remaining)),
+                weights=[max_count - v for v in values],
             )
-            chosen.append(choose)
-            indexes.pop(choose)
+            chosen.append(remaining.pop(position))
         return chosen
 
     def reduce(self) -> None:
         """Minimize the number of constraints."""
         logger.info("Start reduction")
-        start_size = len(self.constraints)
-        while True:
-            for constraint in self.constraints:
-                self.constraints.remove(constraint)
-                if self.complete():
-                    break
-                self.constraints.append(constraint)
-            else:
-                break
+        start_size = len(self._constraints)
+        # Removing constraints only adds solutions, so one pass is enough
+        kept = bytearray([1]) * start_size
+        for i in range(start_size):
+            kept[i] = 0
+            if not self.complete_mask(kept):
+                kept[i] = 1
+        self._constraints = [c for c, k in zip(self._constraints, kept) if k]
+        self._constraint_keys = {c.key for c in self._constraints}
+        self._fast_verify = None
+        self._indicators = [c for c, k in zip(self._indicators, kept) if k]
         logger.info(
             "Reduction result: %s to %s",
             start_size,
-            len(self.constraints),
+            len(self._constraints),
         )
 
     def format(self, name: str) -> str:
         """Format the algorithm with the premade template."""
-        env = Environment(
-            loader=FileSystemLoader(TEMPLATES),
-            autoescape=False,  # noqa: S701
+        return self.format_from_template(
+            _env_for_dir(TEMPLATES).get_template(name + ".j2")
         )
-        for variable in dir(builtins):
-            if not variable.startswith("_"):
-                env.globals[variable] = getattr(builtins, variable)
-        template = env.get_template(name + ".j2")
-        return self.format_from_template(template)
 
     def format_from_path(self, path: Union[str, pathlib.Path]) -> str:
         """Format the algorithm with template on filesystem."""
         path = pathlib.Path(path).resolve()
-        env = Environment(
-            loader=FileSystemLoader(path.parent),
-            autoescape=False,  # noqa: S701
-        )
-        for name in dir(builtins):
-            if not name.startswith("_"):
-                env.globals[name] = getattr(builtins, name)
-        template = env.get_template(path.name)
+        template = _env_for_dir(path.parent).get_template(path.name)
         return self.format_from_template(template)
 
-    def format_from_template(self, template: Template) -> str:
+    def format_from_template(self, template: "Template") -> str:
         """Format the algorithm with the provided template."""
         return template.render(
             secret=self.secret,
-            constraints=self.constraints,
+            constraints=self._constraints,
             size=len(self.secret),
         )
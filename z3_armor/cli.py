@@ -6,7 +6,6 @@ import pathlib
 import sys
 from typing import Optional, Sequence
 
-from .algorithm import Z3Armor
 from .info import __issues__, __summary__, __version__
 
 LOG_LEVELS = ["CRITICAL", "ERROR", "WARNING", "INFO", "DEBUG"]
@@ -69,6 +68,15 @@ def setup_logging(verbose: Optional[bool] = None) -> None:
     )
 
 
+def read_secret() -> str:
+    """Read the secret from the first line of stdin."""
+    line = sys.stdin.readline()
+    if not line:
+        error_message = "No secret provided on stdin."
+        raise EOFError(error_message)
+    return line.rstrip("\n")
+
+
 def entrypoint(argv: Optional[Sequence[str]] = None) -> None:
     """Entrypoint for command line interface."""
     try:
@@ -77,8 +85,11 @@ def entrypoint(argv: Optional[Sequence[str]] = None) -> None:
         args = parser.parse_args(argv)
         setup_logging(args.verbose)
 
-        # Get secret from stdout if not provided
-        secret = input() if args.secret is None else str(args.secret)
+        # Import z3 and jinja only when there is something to generate
+        from .algorithm import Z3Armor
+
+        # Get secret from stdin if not provided
+        secret = read_secret() if args.secret is None else str(args.secret)
 
         # Create the armored program
         armored = Z3Armor(secret=secret.encode(), random_state=args.seed)
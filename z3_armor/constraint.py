@@ -2,7 +2,7 @@
 
 from abc import ABC, abstractmethod
 from dataclasses import dataclass
-from typing import List
+from typing import Hashable, List, Optional, Tuple
 
 from typing_extensions import override
 from z3 import BitVec, BoolRef
@@ -11,10 +11,19 @@ from .operator import Operator
 
 
 class Constraint(ABC):
+    def __post_init__(self) -> None:
+        """Prepare the cache of the expression built by apply."""
+        self._cached_ast: Optional[Tuple[List[BitVec], BoolRef]] = None
+
     @abstractmethod
     def __str__(self) -> str:
         """Representation of the constraint."""
 
+    @property
+    @abstractmethod
+    def key(self) -> Hashable:
+        """Hashable signature of the constraint."""
+
     @abstractmethod
     def apply(self, terms: List[BitVec]) -> BoolRef:
         """Apply terms an BitVec Array."""
@@ -24,7 +33,7 @@ class Constraint(ABC):
         """Check the password."""
 
 
-@dataclass
+@dataclass(eq=False)
 class CompareConstraint(Constraint):
     """secret[0] == (secret[1] ^ 47)."""
 
@@ -37,16 +46,28 @@ class CompareConstraint(Constraint):
     def __str__(self) -> str:
         return f"secret[{self.x}] == (secret[{self.y}] {self.op} {self.n})"
 
+    @property
+    @override
+    def key(self) -> Hashable:
+        return (type(self).__name__, self.x, self.y, self.op.sign, self.n)
+
     @override
     def apply(self, terms: List[BitVec]) -> BoolRef:
-        return terms[self.x] == self.op(terms[self.y], self.n)
+        if self._cached_ast is None or self._cached_ast[0] is not terms:
+            self._cached_ast = (
+                terms,
+                terms[self.x] == self.op(terms[self.y], self.n),
+            )
+        return self._cached_ast[1]
 
     @override
     def check(self, secret: bytes) -> bool:
-        return bool(secret[self.x] == self.op(secret[self.y], self.n) % 256)
+        return bool(
+            secret[self.x] == self.op.func(secret[self.y], self.n) & 0xFF
+        )
 
 
-@dataclass
+@dataclass(eq=False)
 class ConstantConstraint(Constraint):
     """6 == secret[0] ^ 47."""
 
@@ -59,16 +80,26 @@ class ConstantConstraint(Constraint):
     def __str__(self) -> str:
         return f"{self.k} == (secret[{self.x}] {self.op} {self.n})"
 
+    @property
+    @override
+    def key(self) -> Hashable:
+        return (type(self).__name__, self.x, self.k, self.op.sign, self.n)
+
     @override
     def apply(self, terms: List[BitVec]) -> BoolRef:
-        return self.op(terms[self.x], self.n) == self.k
+        if self._cached_ast is None or self._cached_ast[0] is not terms:
+            self._cached_ast = (
+                terms,
+                self.op(terms[self.x], self.n) == self.k,
+            )
+        return self._cached_ast[1]
 
     @override
     def check(self, secret: bytes) -> bool:
-        return bool(self.op(secret[self.x], self.n) % 256 == self.k)
+        return bool(self.op.func(secret[self.x], self.n) & 0xFF == self.k)
 
 
-@dataclass
+@dataclass(eq=False)
 class OperationConstraint(Constraint):
     """secret[0] ^ secret[1] == 4."""
 
@@ -81,10 +112,22 @@ class OperationConstraint(Constraint):
     def __str__(self) -> str:
         return f"(secret[{self.x}] {self.op} secret[{self.y}]) == {self.n}"
 
+    @property
+    @override
+    def key(self) -> Hashable:
+        return (type(self).__name__, self.x, self.y, self.op.sign, self.n)
+
     @override
     def apply(self, terms: List[BitVec]) -> BoolRef:
-        return self.op(terms[self.x], terms[self.y]) == self.n
+        if self._cached_ast is None or self._cached_ast[0] is not terms:
+            self._cached_ast = (
+                terms,
+                self.op(terms[self.x], terms[self.y]) == self.n,
+            )
+        return self._cached_ast[1]
 
     @override
     def check(self, secret: bytes) -> bool:
-        return bool(self.op(secret[self.x], secret[self.y]) % 256 == self.n)
+        return bool(
+            self.op.func(secret[self.x], secret[self.y]) & 0xFF == self.n
+        )
@@ -1,15 +1,24 @@
 """Core module."""
 
-from importlib.metadata import Distribution
+from importlib.metadata import Distribution, PackageNotFoundError
 
-_DISTRIBUTION = Distribution.from_name("z3_armor")
-_METADATA = _DISTRIBUTION.metadata
+try:
+    _get = Distribution.from_name("z3_armor").metadata.__getitem__
+except PackageNotFoundError:  # pragma: no cover
+    _get = {
+        "Author": "Dashstrom",
+        "Author-email": "dashstrom.pro@gmail.com",
+        "License": "MIT",
+        "Version": "0.0.1",
+        "Maintainer": "Dashstrom",
+        "Summary": "Constraint-based obfuscation using z3.",
+    }.__getitem__
 
-__author__ = _METADATA["Author"]
-__email__ = _METADATA["Author-email"]
-__license__ = _METADATA["License"]
-__version__ = _METADATA["Version"]
-__maintainer__ = _METADATA["Maintainer"]
-__summary__ = _METADATA["Summary"]
+__author__ = _get("Author")
+__email__ = _get("Author-email")
+__license__ = _get("License")
+__version__ = _get("Version")
+__maintainer__ = _get("Maintainer")
+__summary__ = _get("Summary")
 __copyright__ = f"{__author__} <{__email__}>"
 __issues__ = "https://github.com/Dashstrom/z3-armor/issues"